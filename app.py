@@ -1,36 +1,85 @@
 from flask import Flask, render_template, request, jsonify, session, redirect, url_for, abort
+from flask import Response, stream_with_context, json as flask_json
+from flask.json.provider import DefaultJSONProvider
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask_sqlalchemy import SQLAlchemy
+from flask_compress import Compress
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from cachetools import TTLCache
+from sqlalchemy import event, func, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+from datetime import datetime, timedelta, timezone
 import os
-import json
+import msgspec
+import orjson
+import sqlite3
+import threading
+import time
 import uuid
+from collections import defaultdict
 from functools import wraps
+from typing import Literal, Optional
 
 # Application Configuration
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-key-please-change-in-production'
     SQLALCHEMY_DATABASE_URI = 'sqlite:///instance/acousticguard_dev.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    WORKER_THREADS = 100  # Keep in step with gunicorn --threads (see README)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'poolclass': QueuePool,
+        'pool_size': 10,
+        'max_overflow': WORKER_THREADS - 10,  # Every worker thread can hold a connection at once
+        'pool_pre_ping': True,
+        'pool_recycle': 1800,
+        'connect_args': {'check_same_thread': False}  # Pooled connections are shared across threads
+    }
     SESSION_COOKIE_SECURE = True
     SESSION_COOKIE_HTTPONLY = True
     PERMANENT_SESSION_LIFETIME = timedelta(days=7)
+    COMPRESS_MIMETYPES = ['text/html', 'text/css', 'application/javascript', 'application/json']
+    COMPRESS_STREAMS = False  # Compressing buffers the whole body, which defeats streamed ranges
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes and decodes with orjson."""
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=self.default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
 
 # Helper Functions
+# Noise categories are stored as their index in this tuple
+_NOISE_CATEGORIES = ('safe', 'moderate', 'harmful')
+_NOISE_CATEGORY_CODES = {name: code for code, name in enumerate(_NOISE_CATEGORIES)}
+
 def get_noise_category(noise_level):
-    """Determine noise category based on decibel level."""
-    if noise_level <= 70:
-        return 'safe'
-    elif noise_level <= 85:
-        return 'moderate'
-    else:
-        return 'harmful'
+    """Determine the noise category code based on decibel level."""
+    # Above 70 dB is moderate, above 85 dB harmful
+    return (noise_level > 70) + (noise_level > 85)
+
+def uuid7_str():
+    """Generate a time-ordered UUIDv7 string so new rows append to the primary key index."""
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), 'big')
+    value = (ms & 0xFFFFFFFFFFFF) << 80 | 0x7 << 76 | (rand >> 62 & 0xFFF) << 64 \
+        | 0b10 << 62 | rand & 0x3FFFFFFFFFFFFFFF
+    return str(uuid.UUID(int=value))
+
+def naive_utc(dt):
+    """Convert an aware datetime to the naive UTC form stored in the database."""
+    return dt.astimezone(timezone.utc).replace(tzinfo=None) if dt.tzinfo else dt
+
+def iso_timestamp(column):
+    """Format a DateTime column as an ISO 8601 string inside SQLite."""
+    return func.strftime('%Y-%m-%dT%H:%M:%f', column).label(column.key)
 
 # Initialize Flask application
 app = Flask(__name__)
 app.config.from_object(Config)
+app.json = OrjsonProvider(app)
 
 # Ensure the instance folder exists
 try:
@@ -40,14 +89,46 @@ except OSError:
 
 # Initialize extensions
 db = SQLAlchemy(app)
-socketio = SocketIO(app, cors_allowed_origins="*")
+Compress(app)
+
+@event.listens_for(Engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _):
+    """Tune every new SQLite connection for concurrent reads and cheap commits."""
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    cur = dbapi_conn.cursor()
+    for pragma in ("journal_mode=WAL", "synchronous=NORMAL", "busy_timeout=5000",
+                   "cache_size=-20000", "temp_store=memory", "foreign_keys=ON"):
+        cur.execute("PRAGMA " + pragma)
+    cur.close()
+
+socketio = SocketIO(app, async_mode='threading', cors_allowed_origins="*", json=flask_json)  # Packets use app.json too
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
 # Database Models
+class JSONText(db.TypeDecorator):
+    """Text column holding a JSON document, encoded and decoded with orjson."""
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return orjson.dumps(value).decode() if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return orjson.loads(value) if value else None
+
+class NoiseCategoryCode(db.TypeDecorator):
+    """Small-integer category code, read back as int even from a legacy VARCHAR column."""
+    impl = db.SmallInteger
+    cache_ok = True
+
+    def process_result_value(self, value, dialect):
+        return int(value) if value is not None else None
+
 class User(UserMixin, db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.String(36), primary_key=True, default=uuid7_str)
     email = db.Column(db.String(120), unique=True, nullable=False)
     first_name = db.Column(db.String(50))
     last_name = db.Column(db.String(50))
@@ -55,16 +136,26 @@ class User(UserMixin, db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Relationships never lazy-load; eager-load them explicitly where needed
+    readings = db.relationship('NoiseReading', back_populates='user', lazy='raise')
+    devices = db.relationship('Device', back_populates='user', lazy='raise')
+
 class NoiseReading(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.String(36), primary_key=True, default=uuid7_str)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
+    device_id = db.Column(db.String(36), db.ForeignKey('device.id'))
     noise_level = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(20), nullable=False)  # 'safe', 'moderate', 'harmful'
+    category = db.Column(NoiseCategoryCode, nullable=False)  # Index into _NOISE_CATEGORIES
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     location = db.Column(db.String(100))
 
+    user = db.relationship('User', back_populates='readings', lazy='raise')
+    device = db.relationship('Device', back_populates='readings', lazy='raise')
+
+    __table_args__ = (db.Index('ix_nr_user_ts', 'user_id', 'timestamp'),)
+
 class Device(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.String(36), primary_key=True, default=uuid7_str)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     device_name = db.Column(db.String(100), nullable=False)
     device_type = db.Column(db.String(50), nullable=False)
@@ -73,15 +164,23 @@ class Device(db.Model):
     last_connected = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    user = db.relationship('User', back_populates='devices', lazy='raise')
+    readings = db.relationship('NoiseReading', back_populates='device', lazy='raise')
+    logs = db.relationship('AiReductionLog', back_populates='device', lazy='raise')
+
+    __table_args__ = (db.Index('ix_device_user', 'user_id'),)
+
 class HealthScore(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.String(36), primary_key=True, default=uuid7_str)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     score = db.Column(db.Integer, nullable=False)
     date = db.Column(db.DateTime, default=datetime.utcnow)
-    factors = db.Column(db.Text)  # JSON string
+    factors = db.Column(JSONText)
+
+    __table_args__ = (db.Index('ix_hs_user_date', 'user_id', 'date'),)
 
 class AiReductionLog(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.String(36), primary_key=True, default=uuid7_str)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     device_id = db.Column(db.String(36), db.ForeignKey('device.id'))
     input_level = db.Column(db.Float, nullable=False)
@@ -89,8 +188,12 @@ class AiReductionLog(db.Model):
     reduction_amount = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
 
+    device = db.relationship('Device', back_populates='logs', lazy='raise')
+
+    __table_args__ = (db.Index('ix_arl_user_ts', 'user_id', 'timestamp'),)
+
 class UserPreferences(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    id = db.Column(db.String(36), primary_key=True, default=uuid7_str)
     user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
     daily_listening_limit = db.Column(db.Integer, default=480)  # minutes
     enable_ai_reduction = db.Column(db.Boolean, default=True)
@@ -98,9 +201,64 @@ class UserPreferences(db.Model):
     notifications = db.Column(db.Boolean, default=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+# Request Schemas
+class NoiseReadingIn(msgspec.Struct):
+    noiseLevel: float
+    category: Literal['safe', 'moderate', 'harmful']
+    location: Optional[str] = 'Real-time monitoring'
+    timestamp: Optional[datetime] = None  # When the client took the reading
+
+class AiReductionLogIn(msgspec.Struct):
+    inputLevel: float
+    outputLevel: float
+    reductionAmount: float
+    deviceId: Optional[str] = None
+
+class _DeviceSchema(msgspec.Struct):
+    def __post_init__(self):
+        # Fractional battery levels are rounded to the whole percent the column holds
+        if self.batteryLevel is not None:
+            self.batteryLevel = round(self.batteryLevel)
+
+class BluetoothDeviceIn(_DeviceSchema):
+    deviceName: str
+    deviceType: str = 'earbuds'
+    batteryLevel: Optional[float] = 100
+
+class DeviceIn(_DeviceSchema):
+    deviceName: str
+    deviceType: str
+    batteryLevel: Optional[float]
+
+class HealthScoreIn(msgspec.Struct):
+    score: int
+    factors: Optional[dict] = {}
+
+# strict=False keeps accepting numbers sent as strings, as float() did
+noise_reading_decoder = msgspec.json.Decoder(NoiseReadingIn, strict=False)
+noise_reading_batch_decoder = msgspec.json.Decoder(list[NoiseReadingIn], strict=False)
+ai_reduction_log_decoder = msgspec.json.Decoder(AiReductionLogIn, strict=False)
+bluetooth_device_decoder = msgspec.json.Decoder(BluetoothDeviceIn, strict=False)
+device_decoder = msgspec.json.Decoder(DeviceIn, strict=False)
+health_score_decoder = msgspec.json.Decoder(HealthScoreIn, strict=False)
+
+# Users are looked up on every request and socket event, so keep them briefly in memory
+_user_cache = TTLCache(maxsize=10000, ttl=30)
+_user_cache_lock = threading.Lock()
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(user_id)
+    with _user_cache_lock:
+        user = _user_cache.get(user_id)
+    if user is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        # Detach so later commits in this session don't expire the cached copy
+        db.session.expunge(user)
+        with _user_cache_lock:
+            _user_cache[user_id] = user
+    return user
 
 def login_required_api(f):
     @wraps(f)
@@ -110,6 +268,37 @@ def login_required_api(f):
         return f(*args, **kwargs)
     return decorated_function
 
+# Real-time noise reading batching
+NOISE_BATCH_INTERVAL = 0.1  # seconds between flushes
+NOISE_BATCH_SIZE = 32  # flush early once a room has this many readings queued
+
+_pending = defaultdict(list)
+_pending_lock = threading.Lock()
+_flush_now = threading.Event()  # Set to flush before the interval is up
+_flusher_started = False
+
+def queue_noise_reading(room, payload):
+    """Buffer a noise reading for the room's next `noise_batch` event."""
+    global _flusher_started
+    with _pending_lock:
+        if not _flusher_started:
+            _flusher_started = True
+            socketio.start_background_task(_flush_noise_batches)
+        _pending[room].append(payload)
+        if len(_pending[room]) >= NOISE_BATCH_SIZE:
+            _flush_now.set()
+
+def _flush_noise_batches():
+    # The only place batches are emitted, so each room receives its readings in order
+    while True:
+        _flush_now.wait(NOISE_BATCH_INTERVAL)
+        _flush_now.clear()
+        with _pending_lock:
+            batches = list(_pending.items())
+            _pending.clear()
+        for room, batch in batches:
+            socketio.emit('noise_batch', batch, room=room)
+
 # Routes
 @app.route('/')
 def index():
@@ -143,6 +332,8 @@ def login():
             )
             user.set_password(password)  # Set password hash
             db.session.add(user)
+            db.session.flush()  # Assign user.id
+            db.session.add(UserPreferences(user_id=user.id))  # Column defaults
             db.session.commit()
         elif not user.check_password(password):
             return jsonify({'error': 'Invalid password'}), 401
@@ -183,14 +374,18 @@ def get_user():
 @login_required_api
 def get_bluetooth_devices():
     try:
-        devices = Device.query.filter_by(user_id=current_user.id).all()
+        devices = db.session.execute(
+            select(Device.id, Device.device_name, Device.device_type, Device.battery_level,
+                   Device.is_connected, iso_timestamp(Device.last_connected))
+            .where(Device.user_id == current_user.id)
+        ).all()
         return jsonify([{
             'id': device.id,
             'deviceName': device.device_name,
             'deviceType': device.device_type,
             'batteryLevel': device.battery_level,
             'isConnected': device.is_connected,
-            'lastConnected': device.last_connected.isoformat()
+            'lastConnected': device.last_connected
         } for device in devices])
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -199,27 +394,30 @@ def get_bluetooth_devices():
 @login_required_api
 def connect_bluetooth_device():
     try:
-        data = request.get_json()
-        if not data or not data.get('deviceName'):
+        try:
+            data = bluetooth_device_decoder.decode(request.get_data())
+        except msgspec.DecodeError as e:
+            return jsonify({'error': str(e)}), 400
+        if not data.deviceName:
             return jsonify({'error': 'Device name is required'}), 400
 
-        device = Device(
-            user_id=current_user.id,
-            device_name=data['deviceName'],
-            device_type=data.get('deviceType', 'earbuds'),
-            battery_level=data.get('batteryLevel', 100),
-            is_connected=True
-        )
-        
-        db.session.add(device)
+        device = db.session.execute(
+            insert(Device).values(
+                user_id=current_user.id,
+                device_name=data.deviceName,
+                device_type=data.deviceType,
+                battery_level=data.batteryLevel,
+                is_connected=True
+            ).returning(Device.id)
+        ).one()
         db.session.commit()
 
         # Emit WebSocket event for real-time updates
         socketio.emit('device_connected', {
             'deviceId': device.id,
-            'deviceName': device.device_name,
-            'deviceType': device.device_type,
-            'batteryLevel': device.battery_level
+            'deviceName': data.deviceName,
+            'deviceType': data.deviceType,
+            'batteryLevel': data.batteryLevel
         }, room=current_user.id)
 
         return jsonify({
@@ -234,8 +432,8 @@ def connect_bluetooth_device():
 @login_required_api
 def disconnect_bluetooth_device(device_id):
     try:
-        device = Device.query.filter_by(id=device_id, user_id=current_user.id).first()
-        if not device:
+        device = db.session.get(Device, device_id)
+        if not device or device.user_id != current_user.id:
             return jsonify({'error': 'Device not found'}), 404
 
         device.is_connected = False
@@ -256,47 +454,85 @@ def disconnect_bluetooth_device(device_id):
 @app.route('/api/noise-readings', methods=['POST'])
 @login_required_api
 def create_noise_reading():
-    data = request.get_json()
-    
-    reading = NoiseReading(
-        user_id=current_user.id,
-        noise_level=float(data['noiseLevel']),
-        category=data['category'],
-        location=data.get('location', 'Real-time monitoring')
-    )
+    try:
+        data = noise_reading_decoder.decode(request.get_data())
+    except msgspec.DecodeError as e:
+        return jsonify({'error': str(e)}), 400
     
-    db.session.add(reading)
+    # RETURNING hands back the generated id and timestamp, so nothing is re-read after commit
+    reading = db.session.execute(
+        insert(NoiseReading).values(
+            user_id=current_user.id,
+            noise_level=data.noiseLevel,
+            category=_NOISE_CATEGORY_CODES[data.category],
+            location=data.location
+        ).returning(NoiseReading.id, NoiseReading.timestamp)
+    ).one()
     db.session.commit()
     
-    # Emit to WebSocket clients
-    socketio.emit('noise_reading', {
+    payload = {
         'id': reading.id,
-        'noiseLevel': str(reading.noise_level),
-        'category': reading.category,
+        'noiseLevel': str(data.noiseLevel),
+        'category': data.category,
         'timestamp': reading.timestamp.isoformat(),
-        'location': reading.location
-    })
+        'location': data.location
+    }
     
-    return jsonify({
-        'id': reading.id,
-        'noiseLevel': str(reading.noise_level),
-        'category': reading.category,
-        'timestamp': reading.timestamp.isoformat(),
-        'location': reading.location
-    })
+    # Queue for the next batched WebSocket update
+    queue_noise_reading(current_user.id, payload)
+    
+    return jsonify(payload)
+
+@app.route('/api/noise-readings/batch', methods=['POST'])
+@login_required_api
+def create_noise_readings_batch():
+    try:
+        data = noise_reading_batch_decoder.decode(request.get_data())
+    except msgspec.DecodeError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    now = datetime.utcnow()
+    rows = [{
+        'id': uuid7_str(),
+        'user_id': current_user.id,
+        'noise_level': d.noiseLevel,
+        'category': _NOISE_CATEGORY_CODES[d.category],
+        'timestamp': naive_utc(d.timestamp) if d.timestamp else now,
+        'location': d.location
+    } for d in data]
+    
+    # One INSERT transaction for the whole batch
+    db.session.bulk_insert_mappings(NoiseReading, rows)
+    db.session.commit()
+    
+    readings = [{
+        'id': r['id'],
+        'noiseLevel': str(r['noise_level']),
+        'category': _NOISE_CATEGORIES[r['category']],
+        'timestamp': r['timestamp'].isoformat(),
+        'location': r['location']
+    } for r in rows]
+    for reading in readings:
+        queue_noise_reading(current_user.id, reading)
+    
+    return jsonify(readings)
 
 @app.route('/api/noise-readings')
 @login_required_api
 def get_noise_readings():
     limit = request.args.get('limit', 50, type=int)
-    readings = NoiseReading.query.filter_by(user_id=current_user.id)\
-        .order_by(NoiseReading.timestamp.desc()).limit(limit).all()
+    readings = db.session.execute(
+        select(NoiseReading.id, NoiseReading.noise_level, NoiseReading.category,
+               iso_timestamp(NoiseReading.timestamp), NoiseReading.location)
+        .where(NoiseReading.user_id == current_user.id)
+        .order_by(NoiseReading.timestamp.desc()).limit(limit)
+    ).all()
     
     return jsonify([{
         'id': r.id,
         'noiseLevel': str(r.noise_level),
-        'category': r.category,
-        'timestamp': r.timestamp.isoformat(),
+        'category': _NOISE_CATEGORIES[r.category],
+        'timestamp': r.timestamp,
         'location': r.location
     } for r in readings])
 
@@ -306,58 +542,71 @@ def get_noise_readings_range():
     start_date = datetime.fromisoformat(request.args.get('startDate'))
     end_date = datetime.fromisoformat(request.args.get('endDate'))
     
-    readings = NoiseReading.query.filter(
-        NoiseReading.user_id == current_user.id,
-        NoiseReading.timestamp >= start_date,
-        NoiseReading.timestamp <= end_date
-    ).order_by(NoiseReading.timestamp.desc()).all()
-    
-    return jsonify([{
-        'id': r.id,
-        'noiseLevel': str(r.noise_level),
-        'category': r.category,
-        'timestamp': r.timestamp.isoformat(),
-        'location': r.location
-    } for r in readings])
+    stmt = select(NoiseReading.id, NoiseReading.noise_level, NoiseReading.category,
+                  iso_timestamp(NoiseReading.timestamp), NoiseReading.location)\
+        .where(
+            NoiseReading.user_id == current_user.id,
+            NoiseReading.timestamp >= start_date,
+            NoiseReading.timestamp <= end_date
+        ).order_by(NoiseReading.timestamp.desc()).execution_options(yield_per=1000)
+    
+    # Ranges are unbounded, so stream the JSON array instead of building it in memory
+    def generate():
+        yield b'['
+        for i, r in enumerate(db.session.execute(stmt)):
+            if i:
+                yield b','
+            yield orjson.dumps({
+                'id': r.id,
+                'noiseLevel': str(r.noise_level),
+                'category': _NOISE_CATEGORIES[r.category],
+                'timestamp': r.timestamp,
+                'location': r.location
+            })
+        yield b']'
+    
+    return Response(stream_with_context(generate()), mimetype='application/json')
 
 @app.route('/api/devices', methods=['POST'])
 @login_required_api
 def create_device():
-    data = request.get_json()
-    
-    device = Device(
-        user_id=current_user.id,
-        device_name=data['deviceName'],
-        device_type=data['deviceType'],
-        battery_level=data['batteryLevel']
-    )
+    try:
+        data = device_decoder.decode(request.get_data())
+    except msgspec.DecodeError as e:
+        return jsonify({'error': str(e)}), 400
     
-    db.session.add(device)
+    device = db.session.execute(
+        insert(Device).values(
+            user_id=current_user.id,
+            device_name=data.deviceName,
+            device_type=data.deviceType,
+            battery_level=data.batteryLevel
+        ).returning(Device.id, Device.is_connected, Device.last_connected)
+    ).one()
     db.session.commit()
     
-    # Emit to WebSocket clients
-    socketio.emit('device_status', {
+    payload = {
         'id': device.id,
-        'deviceName': device.device_name,
-        'deviceType': device.device_type,
-        'batteryLevel': device.battery_level,
+        'deviceName': data.deviceName,
+        'deviceType': data.deviceType,
+        'batteryLevel': data.batteryLevel,
         'isConnected': device.is_connected,
         'lastConnected': device.last_connected.isoformat()
-    })
+    }
     
-    return jsonify({
-        'id': device.id,
-        'deviceName': device.device_name,
-        'deviceType': device.device_type,
-        'batteryLevel': device.battery_level,
-        'isConnected': device.is_connected,
-        'lastConnected': device.last_connected.isoformat()
-    })
+    # Emit to the user's WebSocket clients
+    socketio.emit('device_status', payload, room=current_user.id)
+    
+    return jsonify(payload)
 
 @app.route('/api/devices')
 @login_required_api
 def get_devices():
-    devices = Device.query.filter_by(user_id=current_user.id).all()
+    devices = db.session.execute(
+        select(Device.id, Device.device_name, Device.device_type, Device.battery_level,
+               Device.is_connected, iso_timestamp(Device.last_connected))
+        .where(Device.user_id == current_user.id)
+    ).all()
     
     return jsonify([{
         'id': d.id,
@@ -365,16 +614,16 @@ def get_devices():
         'deviceType': d.device_type,
         'batteryLevel': d.battery_level,
         'isConnected': d.is_connected,
-        'lastConnected': d.last_connected.isoformat()
+        'lastConnected': d.last_connected
     } for d in devices])
 
 @app.route('/api/devices/<device_id>/status', methods=['PATCH'])
 @login_required_api
 def update_device_status(device_id):
     data = request.get_json()
-    device = Device.query.filter_by(id=device_id, user_id=current_user.id).first()
+    device = db.session.get(Device, device_id)
     
-    if not device:
+    if not device or device.user_id != current_user.id:
         return jsonify({'message': 'Device not found'}), 404
     
     device.is_connected = data.get('isConnected', device.is_connected)
@@ -383,7 +632,7 @@ def update_device_status(device_id):
     
     db.session.commit()
     
-    # Emit to WebSocket clients
+    # Emit to the user's WebSocket clients
     socketio.emit('device_status', {
         'id': device.id,
         'deviceName': device.device_name,
@@ -391,7 +640,7 @@ def update_device_status(device_id):
         'batteryLevel': device.battery_level,
         'isConnected': device.is_connected,
         'lastConnected': device.last_connected.isoformat()
-    })
+    }, room=current_user.id)
     
     return jsonify({
         'id': device.id,
@@ -405,22 +654,25 @@ def update_device_status(device_id):
 @app.route('/api/health-scores', methods=['POST'])
 @login_required_api
 def create_health_score():
-    data = request.get_json()
-    
-    score = HealthScore(
-        user_id=current_user.id,
-        score=data['score'],
-        factors=json.dumps(data.get('factors', {}))
-    )
+    try:
+        data = health_score_decoder.decode(request.get_data())
+    except msgspec.DecodeError as e:
+        return jsonify({'error': str(e)}), 400
     
-    db.session.add(score)
+    score = db.session.execute(
+        insert(HealthScore).values(
+            user_id=current_user.id,
+            score=data.score,
+            factors=data.factors
+        ).returning(HealthScore.id, HealthScore.date)
+    ).one()
     db.session.commit()
     
     return jsonify({
         'id': score.id,
-        'score': score.score,
+        'score': data.score,
         'date': score.date.isoformat(),
-        'factors': json.loads(score.factors) if score.factors else {}
+        'factors': data.factors or {}
     })
 
 @app.route('/api/health-scores/latest')
@@ -436,39 +688,39 @@ def get_latest_health_score():
         'id': score.id,
         'score': score.score,
         'date': score.date.isoformat(),
-        'factors': json.loads(score.factors) if score.factors else {}
+        'factors': score.factors or {}
     })
 
 @app.route('/api/health-scores')
 @login_required_api
 def get_health_scores():
     limit = request.args.get('limit', 30, type=int)
-    scores = HealthScore.query.filter_by(user_id=current_user.id)\
-        .order_by(HealthScore.date.desc()).limit(limit).all()
+    scores = db.session.execute(
+        select(HealthScore.id, HealthScore.score, iso_timestamp(HealthScore.date), HealthScore.factors)
+        .where(HealthScore.user_id == current_user.id)
+        .order_by(HealthScore.date.desc()).limit(limit)
+    ).all()
     
     return jsonify([{
         'id': s.id,
         'score': s.score,
-        'date': s.date.isoformat(),
-        'factors': json.loads(s.factors) if s.factors else {}
+        'date': s.date,
+        'factors': s.factors or {}
     } for s in scores])
 
 @app.route('/api/exposure-stats/today')
 @login_required_api
 def get_today_exposure_stats():
-    today = datetime.now().date()
-    start_of_day = datetime.combine(today, datetime.min.time())
-    end_of_day = datetime.combine(today, datetime.max.time())
-    
-    readings = NoiseReading.query.filter(
+    # Today's UTC bounds are computed by SQLite, matching the utcnow() timestamps
+    counts = dict(db.session.query(NoiseReading.category, func.count()).filter(
         NoiseReading.user_id == current_user.id,
-        NoiseReading.timestamp >= start_of_day,
-        NoiseReading.timestamp <= end_of_day
-    ).all()
+        NoiseReading.timestamp >= func.date('now', 'start of day'),
+        NoiseReading.timestamp < func.date('now', '+1 day', 'start of day')
+    ).group_by(NoiseReading.category).all())
     
-    total_safe = sum(1 for r in readings if r.category == 'safe') * 5  # 5 minutes per reading
-    total_moderate = sum(1 for r in readings if r.category == 'moderate') * 5
-    total_harmful = sum(1 for r in readings if r.category == 'harmful') * 5
+    total_safe = counts.get(_NOISE_CATEGORY_CODES['safe'], 0) * 5  # 5 minutes per reading
+    total_moderate = counts.get(_NOISE_CATEGORY_CODES['moderate'], 0) * 5
+    total_harmful = counts.get(_NOISE_CATEGORY_CODES['harmful'], 0) * 5
     
     return jsonify({
         'totalSafeTime': total_safe,
@@ -479,24 +731,33 @@ def get_today_exposure_stats():
 @app.route('/api/ai-reduction-logs', methods=['POST'])
 @login_required_api
 def create_ai_reduction_log():
-    data = request.get_json()
-    
-    log = AiReductionLog(
-        user_id=current_user.id,
-        device_id=data.get('deviceId'),
-        input_level=float(data['inputLevel']),
-        output_level=float(data['outputLevel']),
-        reduction_amount=float(data['reductionAmount'])
-    )
-    
-    db.session.add(log)
+    try:
+        data = ai_reduction_log_decoder.decode(request.get_data())
+    except msgspec.DecodeError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # foreign_keys=ON rejects unknown ids, and other users' devices must not be referenced
+    if data.deviceId is not None:
+        device = db.session.get(Device, data.deviceId)
+        if not device or device.user_id != current_user.id:
+            return jsonify({'error': 'Device not found'}), 404
+
+    log = db.session.execute(
+        insert(AiReductionLog).values(
+            user_id=current_user.id,
+            device_id=data.deviceId,
+            input_level=data.inputLevel,
+            output_level=data.outputLevel,
+            reduction_amount=data.reductionAmount
+        ).returning(AiReductionLog.id, AiReductionLog.timestamp)
+    ).one()
     db.session.commit()
     
     return jsonify({
         'id': log.id,
-        'inputLevel': str(log.input_level),
-        'outputLevel': str(log.output_level),
-        'reductionAmount': str(log.reduction_amount),
+        'inputLevel': str(data.inputLevel),
+        'outputLevel': str(data.outputLevel),
+        'reductionAmount': str(data.reductionAmount),
         'timestamp': log.timestamp.isoformat()
     })
 
@@ -504,15 +765,19 @@ def create_ai_reduction_log():
 @login_required_api
 def get_ai_reduction_logs():
     limit = request.args.get('limit', 100, type=int)
-    logs = AiReductionLog.query.filter_by(user_id=current_user.id)\
-        .order_by(AiReductionLog.timestamp.desc()).limit(limit).all()
+    logs = db.session.execute(
+        select(AiReductionLog.id, AiReductionLog.input_level, AiReductionLog.output_level,
+               AiReductionLog.reduction_amount, iso_timestamp(AiReductionLog.timestamp))
+        .where(AiReductionLog.user_id == current_user.id)
+        .order_by(AiReductionLog.timestamp.desc()).limit(limit)
+    ).all()
     
     return jsonify([{
         'id': l.id,
         'inputLevel': str(l.input_level),
         'outputLevel': str(l.output_level),
         'reductionAmount': str(l.reduction_amount),
-        'timestamp': l.timestamp.isoformat()
+        'timestamp': l.timestamp
     } for l in logs])
 
 @app.route('/api/preferences')
@@ -521,16 +786,15 @@ def get_preferences():
     prefs = UserPreferences.query.filter_by(user_id=current_user.id).first()
     
     if not prefs:
-        # Create default preferences
-        prefs = UserPreferences(
-            user_id=current_user.id,
-            daily_listening_limit=480,
-            enable_ai_reduction=True,
-            alert_threshold=75.0,
-            notifications=True
-        )
-        db.session.add(prefs)
-        db.session.commit()
+        # Defaults are stored by the first PATCH, keep this route read-only
+        columns = UserPreferences.__table__.c
+        return jsonify({
+            'id': None,
+            'dailyListeningLimit': columns.daily_listening_limit.default.arg,
+            'enableAiReduction': columns.enable_ai_reduction.default.arg,
+            'alertThreshold': str(columns.alert_threshold.default.arg),
+            'notifications': columns.notifications.default.arg
+        })
     
     return jsonify({
         'id': prefs.id,
@@ -596,35 +860,44 @@ def handle_device_update(data):
         if not device_id:
             return
         
-        device = Device.query.filter_by(
-            id=device_id, 
-            user_id=current_user.id
-        ).first()
+        device = db.session.get(Device, device_id)
         
-        if not device:
+        if not device or device.user_id != current_user.id:
             return
         
         # Update device status
         if 'batteryLevel' in data:
             device.battery_level = data['batteryLevel']
+        # Payloads are built from these, as the commit would expire the device
+        status = {'deviceId': device.id, 'batteryLevel': device.battery_level}
+        reading = None
         if 'noiseLevel' in data:
-            # Create noise reading
-            reading = NoiseReading(
-                user_id=current_user.id,
-                device_id=device_id,
-                noise_level=float(data['noiseLevel']),
-                category=get_noise_category(float(data['noiseLevel']))
-            )
-            db.session.add(reading)
+            # Create noise reading; RETURNING spares a read-back after commit
+            noise_level = float(data['noiseLevel'])
+            category = get_noise_category(noise_level)
+            reading = db.session.execute(
+                insert(NoiseReading).values(
+                    user_id=current_user.id,
+                    device_id=device_id,
+                    noise_level=noise_level,
+                    category=category
+                ).returning(NoiseReading.id, NoiseReading.timestamp)
+            ).one()
         
         db.session.commit()
         
+        if reading is not None:
+            queue_noise_reading(current_user.id, {
+                'id': reading.id,
+                'noiseLevel': str(noise_level),
+                'category': _NOISE_CATEGORIES[category],
+                'timestamp': reading.timestamp.isoformat(),
+                'location': None
+            })
+        
         # Emit update to all clients in the user's room
-        emit('device_status', {
-            'deviceId': device.id,
-            'batteryLevel': device.battery_level,
-            'lastUpdate': datetime.utcnow().isoformat()
-        }, room=current_user.id)
+        status['lastUpdate'] = datetime.utcnow().isoformat()
+        emit('device_status', status, room=current_user.id)
         
     except Exception as e:
         db.session.rollback()
@@ -663,9 +936,9 @@ def internal_error(error):
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+    # Development server only; production runs wsgi.py under gunicorn
     socketio.run(app, 
-                debug=True, 
+                debug=os.environ.get('FLASK_DEBUG') == '1', 
                 host='0.0.0.0', 
                 port=5000,
-                ssl_context=None,  # Set to 'adhoc' for HTTPS in production
-                cors_allowed_origins="*")
+                ssl_context=None)  # Set to 'adhoc' for HTTPS in production
@@ -233,8 +233,11 @@ class RealTimeSync {
                 this.attemptReconnect();
             });
 
-            this.socket.on('noise_reading', (data) => {
-                this.emit('noise_reading', data);
+            this.socket.on('noise_batch', (batch) => {
+                // Readings arrive batched; listeners only need the latest one
+                if (batch.length > 0) {
+                    this.emit('noise_reading', batch[batch.length - 1]);
+                }
             });
 
             this.socket.on('device_status', (data) => {
@@ -0,0 +1,12 @@
+# Production entry point:
+#   gunicorn -w 1 --threads 100 --bind 0.0.0.0:5000 wsgi:application
+# --threads must match Config.WORKER_THREADS, which sizes the database pool.
+# Each open WebSocket holds a thread; see the README for connection limits.
+# Socket.IO keeps connection state in the worker, so scale out with more
+# instances behind a sticky-session proxy rather than more workers.
+from app import app, db
+
+with app.app_context():
+    db.create_all()
+
+application = app